@@ -2,40 +2,309 @@ import streamlit as st
 import streamlit_authenticator as stauth
 from pathlib import Path
 import pickle
-from langdetect import detect
-import random
+import hashlib
+import collections
+import numpy as np
+import zstandard as zstd
 import datetime
-import openai
+import time
+import atexit
+import json
+import queue
+import threading
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Protocol
 
 # ============ USER AUTH SETUP ===============
-users_db = {"admin": {"name": "Admin", "password": stauth.Hasher(["admin123"]).generate()[0]}}
-CREDENTIALS_FILE = "users.pkl"
+# Precomputed bcrypt hash of the default admin password ("admin123").
+# Streamlit reruns this whole script on every interaction, so hashing it
+# inline would redo the full bcrypt KDF on every widget click.
+ADMIN_HASH = "$2b$12$qr2PUesplD/NzRhUifUece1e9TDHOrGdgS8KuPa5YTOXaA.L7wtJK"
+users_db = {"admin": {"name": "Admin", "password": ADMIN_HASH}}
+CREDENTIALS_FILE = "users.pkl"  # legacy pickle store, read-only
+USERS_FILE = "users.jsonl"
 
-# Save credentials
-def save_users(users):
-    with open(CREDENTIALS_FILE, "wb") as f:
-        pickle.dump(users, f)
+# Class options for the quiz selectbox, built once instead of per rerun.
+_GRADES = ("1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12")
 
-# Load credentials
+_RNG = np.random.default_rng()
+
+# Append one record per signup instead of rewriting the whole credentials
+# store; bytes written per signup stay O(1) as the user base grows.
+def add_user(username, name, pwhash):
+    with open(USERS_FILE, "a", buffering=1 << 16) as f:
+        f.write(json.dumps({"u": username, "n": name, "p": pwhash}) + "\n")
+
+# Load credentials: defaults, then the legacy pickle if present, then the
+# append-only log (later lines win, so re-signups take the newest hash).
 def load_users():
+    users = dict(users_db)
     if Path(CREDENTIALS_FILE).exists():
         with open(CREDENTIALS_FILE, "rb") as f:
-            return pickle.load(f)
-    return users_db
+            users.update(pickle.load(f))
+    if Path(USERS_FILE).exists():
+        with open(USERS_FILE, "r") as f:
+            for line in f:
+                rec = json.loads(line)
+                users[rec["u"]] = {"name": rec["n"], "password": rec["p"]}
+    return users
+
+# Read the credentials pickle once per process instead of on every rerun;
+# the signup path clears this cache after writing new credentials.
+@st.cache_resource(show_spinner=False)
+def load_users_cached():
+    return load_users()
+
+users_db = load_users_cached()
+
+# ============ CHAT HISTORY WRITER ===============
+CHAT_HISTORY_FILE = "chat_history.txt"
+CHAT_FLUSH_MAX_ENTRIES = 16
+CHAT_FLUSH_MAX_AGE = 1.0  # seconds
+
+# Buffer saved chats in session state and flush in one writelines() call,
+# so each save is an in-memory append instead of a sync-committed write.
+def _flush_chat(force=False):
+    buf = st.session_state.get("_chat_write_buf")
+    if not buf:
+        return
+    last_flush = st.session_state.get("_chat_last_flush", 0.0)
+    if force or len(buf) >= CHAT_FLUSH_MAX_ENTRIES or time.time() - last_flush > CHAT_FLUSH_MAX_AGE:
+        with open(CHAT_HISTORY_FILE, "a", buffering=1 << 16) as f:
+            f.writelines(buf)
+        # Only clear after writelines returns so a failed flush loses nothing.
+        buf.clear()
+        st.session_state["_chat_last_flush"] = time.time()
+
+# on_click callback for the Save button: with clear_on_submit forms, a
+# nested `if st.button(...)` inside the submit branch never renders on
+# the click's rerun, so the save must hang off the persisted history.
+def _save_last_chat():
+    user_msg, ai_msg = st.session_state.chat_history[-1][:2]
+    st.session_state["_chat_write_buf"].append(
+        f"{datetime.datetime.now().isoformat()}\n{user_msg}\n{ai_msg}\n\n"
+    )
+    _flush_chat()
+    st.toast("Chat saved!")
+
+# Register the shutdown flush once per process: the script body reruns on
+# every interaction, so a bare atexit.register here would stack a new
+# handler per rerun.
+@st.cache_resource(show_spinner=False)
+def _register_chat_flush():
+    def _final_flush():
+        try:
+            _flush_chat(force=True)
+        except Exception:
+            pass  # no script-run context left at interpreter exit
+    atexit.register(_final_flush)
+    return _final_flush
+
+_register_chat_flush()
+
+# Keep only a window of recent messages hot for rendering; older ones are
+# pickled and zstd-compressed in session state (chat text compresses
+# 4-8x at level 3) and can be pulled back on demand.
+HISTORY_WINDOW = 20
+ARCHIVE_CHUNK = 10
+
+def _archive_overflow():
+    hist = st.session_state.chat_history
+    if len(hist) <= HISTORY_WINDOW:
+        return
+    oldest = [hist.popleft() for _ in range(ARCHIVE_CHUNK)]
+    payload = zstd.ZstdCompressor(level=3).compress(
+        pickle.dumps(oldest, protocol=pickle.HIGHEST_PROTOCOL)
+    )
+    st.session_state.setdefault("chat_archive", []).append(payload)
 
-users_db = load_users()
+def _restore_archived():
+    blobs = st.session_state.get("chat_archive")
+    if blobs:
+        oldest = pickle.loads(zstd.ZstdDecompressor().decompress(blobs.pop()))
+        st.session_state.chat_history.extendleft(reversed(oldest))
+
+# ============ FEEDBACK WRITER ===============
+FEEDBACK_FILE = "feedback.jsonl"
+FEEDBACK_FLUSH_MAX_ENTRIES = 32
+FEEDBACK_FLUSH_MAX_AGE = 5.0  # seconds
+
+# One daemon thread per process drains a queue and appends feedback in
+# batched writelines() calls, so a thumbs click never blocks on disk.
+@st.cache_resource(show_spinner=False)
+def _feedback_writer():
+    q = queue.Queue()
+
+    def _loop():
+        buf = []
+        last_flush = time.time()
+        while True:
+            try:
+                buf.append(q.get(timeout=1.0))
+            except queue.Empty:
+                pass
+            if buf and (len(buf) >= FEEDBACK_FLUSH_MAX_ENTRIES
+                        or time.time() - last_flush > FEEDBACK_FLUSH_MAX_AGE):
+                with open(FEEDBACK_FILE, "a", buffering=1 << 16) as f:
+                    f.writelines(buf)
+                buf.clear()
+                last_flush = time.time()
+
+    threading.Thread(target=_loop, daemon=True).start()
+    return q
+
+def _record_feedback(msg_id, user_msg, ai_msg, msg_persona, verdict):
+    entry = {
+        "message_id": msg_id,
+        "user_input": user_msg,
+        "ai_response": ai_msg,
+        "persona": msg_persona,
+        "feedback": verdict,
+        "timestamp": datetime.datetime.now().isoformat(),
+    }
+    st.session_state.feedback_log.append(entry)
+    _feedback_writer().put(json.dumps(entry) + "\n")
+    st.toast("Thanks for the feedback!")
 
 # ============ UI ================
 st.set_page_config(page_title="My Edu AI App", layout="centered", page_icon="🤖")
 st.title("📘 My Edu AI Assistant")
 st.markdown("👩‍🏫 Chat | 🧠 Learn | 🎓 Quiz | 🌐 Multilingual")
 
+# ============ OPENAI SETUP ===============
+if "OPENAI_API_KEY" not in st.secrets:
+    st.error("🔑 OPENAI_API_KEY missing in secrets.")
+    st.stop()
+
+# One client per process with a keepalive pool, so reruns reuse the
+# TCP/TLS connection instead of paying a fresh handshake per request.
+# openai/httpx are imported here, not at module top: importing them pulls
+# in pydantic and friends, which the unauthenticated login screen never
+# needs, and cache_resource means it happens once per process anyway.
+@st.cache_resource(show_spinner=False)
+def _openai_client():
+    import openai
+    import httpx
+
+    return openai.OpenAI(
+        api_key=st.secrets["OPENAI_API_KEY"],
+        http_client=httpx.Client(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=8),
+        ),
+    )
+
+# Decide test mode once at import and bind a client implementation; call
+# sites go through `llm` and never branch on test mode during a rerun.
+IS_TESTING = "pytest" in sys.modules
+
+class LLMClient(Protocol):
+    def chat(self, messages): ...
+
+    def stream(self, messages): ...
+
+class RealLLM:
+    def chat(self, messages):
+        resp = _openai_client().chat.completions.create(model="gpt-3.5-turbo", messages=messages)
+        return resp.choices[0].message.content
+
+    def stream(self, messages):
+        completion = _openai_client().chat.completions.create(
+            model="gpt-3.5-turbo", messages=messages, stream=True
+        )
+        for chunk in completion:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+class MockLLM:
+    # Offline stand-in bound under pytest; records calls for assertions.
+    def __init__(self):
+        self.calls = []
+        self.response = "[mock response]"
+
+    def chat(self, messages):
+        self.calls.append(messages)
+        return self.response
+
+    def stream(self, messages):
+        yield self.chat(messages)
+
+llm: LLMClient = MockLLM() if IS_TESTING else RealLLM()
+
+def _prompt_key(*parts):
+    # blake2b runs in the C extension, so hashing multi-KB prompts down to
+    # a 32-char digest costs microseconds; Streamlit then hashes the short
+    # digest instead of the full prompt text on every cache lookup.
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(p.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+# Completions are pure functions of their prompt, so cache them: asking
+# the same thing again is a dict lookup instead of an LLM round-trip.
+# The underscore keeps the message payload out of the cache key; `key`
+# is the blake2b digest of the same content.
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=256)
+def _cached_completion(key, _messages):
+    return llm.chat(_messages)
+
+def _fetch_learning_content(topic, persona, lang):
+    user = f"Explain the topic: {topic}. Use a {persona} tone and reply in {lang}."
+    messages = [_LEARN_SYSTEM_MSG, {"role": "user", "content": user}]
+    return _cached_completion(_prompt_key(_LEARN_SYSTEM_MSG["content"], user), messages)
+
+# Shared system messages, built once: call sites (and tests) can compare
+# these by identity instead of deep-comparing their content strings.
+_LEARN_SYSTEM_MSG = {"role": "system", "content": "You are an AI assistant that provides educational content."}
+_QUIZ_SYSTEM_MSG = {"role": "system", "content": "You are an AI assistant that generates quizzes."}
+
+# Interned so every rerun (and the test suite) reuses one string object
+# for the context prefix instead of re-allocating it per message.
+_CTX_PREFIX = sys.intern(" The user is currently learning about '")
+
+def _build_chat_messages(chat_input, persona, lang):
+    system_msg = f"You are a {persona} assistant for students. Reply in {lang}."
+    if st.session_state.get("learning_topic"):
+        system_msg = "".join((system_msg, _CTX_PREFIX, st.session_state.learning_topic, "'."))
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": chat_input},
+    ]
+
+def _fetch_quiz(topic, subject, grade, chapter):
+    user = (
+        f"Create a 5-question multiple-choice quiz on '{topic}' "
+        f"for {subject}, class {grade}, chapter '{chapter}'."
+    )
+    messages = [_QUIZ_SYSTEM_MSG, {"role": "user", "content": user}]
+    return _cached_completion(_prompt_key(_QUIZ_SYSTEM_MSG["content"], user), messages)
+
+# Shared worker pool for independent LLM calls. These are network-bound,
+# so threads are enough: the GIL is released while waiting on the socket.
+@st.cache_resource(show_spinner=False)
+def _pool():
+    return ThreadPoolExecutor(max_workers=4)
+
 # ============ LOGIN SYSTEM ================
-authenticator = stauth.Authenticate(
-    credentials={"usernames": {u: {"name": d["name"], "password": d["password"]} for u, d in users_db.items()}},
-    cookie_name="eduai",
-    key="abc",
-    cookie_expiry_days=7
+# Build the credentials dict and Authenticate instance once per user set
+# instead of re-deriving both on every rerun; the frozen tuple keys the
+# cache, so a changed user base gets a fresh instance automatically.
+@st.cache_resource(show_spinner=False)
+def _get_authenticator(users_frozen):
+    creds = {"usernames": {u: {"name": n, "password": p} for u, n, p in users_frozen}}
+    return stauth.Authenticate(
+        credentials=creds,
+        cookie_name="eduai",
+        key="abc",
+        cookie_expiry_days=7
+    )
+
+authenticator = _get_authenticator(
+    tuple(sorted((u, d["name"], d["password"]) for u, d in users_db.items()))
 )
 
 name, auth_status, username = authenticator.login("Login", "main")
@@ -53,8 +322,11 @@ with st.expander("📌 New user? Sign up here"):
         if new_user in users_db:
             st.error("🚫 Username already exists.")
         else:
-            users_db[new_user] = {"name": new_user, "password": stauth.Hasher([new_pass]).generate()[0]}
-            save_users(users_db)
+            hashed = stauth.Hasher([new_pass]).generate()[0]
+            users_db[new_user] = {"name": new_user, "password": hashed}
+            add_user(new_user, new_user, hashed)
+            load_users_cached.clear()
+            _get_authenticator.clear()
             st.success("✅ Account created. Please log in!")
 
 # ============ MAIN APP ====================
@@ -65,39 +337,106 @@ if auth_status:
     lang = st.selectbox("🌍 Language", ["English", "Hindi"])
     st.markdown("---")
 
-    chat_input = st.text_input("💬 Ask me anything...", key="chat_input")
+    st.session_state.setdefault("_chat_write_buf", [])
+    st.session_state.setdefault("_chat_last_flush", time.time())
+    st.session_state.setdefault("feedback_log", [])
+
+    # A form batches typing into one rerun on submit; a bare text_input
+    # reruns the script (and hit the API) on every keystroke.
+    with st.form("chat_form", clear_on_submit=True):
+        chat_input = st.text_input("💬 Ask me anything...", key="chat_input_main")
+        submitted = st.form_submit_button("Send")
     chat_area = st.empty()
 
-    if chat_input:
-        st.session_state.chat_history = st.session_state.get("chat_history", []) + [(chat_input, persona)]
+    if submitted and chat_input:
+        messages = _build_chat_messages(chat_input, persona, lang)
 
-        # Simulated AI reply
-        response = f"[{persona} Persona says]: " + chat_input[::-1]  # Replace with real API call
         chat_area.markdown(f"**You:** {chat_input}")
-        chat_area.markdown("**AI:** ")
 
-        # Simulate typing
-        response_container = st.empty()
-        for i in range(len(response)):
-            response_container.markdown("**AI:** " + response[:i+1])
-            st.sleep(0.02)
+        # Stream tokens as they arrive: perceived latency becomes time to
+        # first token instead of time to the full completion.
+        response = st.write_stream(llm.stream(messages))
+        # Monotonic counter: unlike now().timestamp(), two messages in the
+        # same microsecond can't collide on their widget keys.
+        st.session_state.setdefault("_msg_counter", 0)
+        message_id = str(st.session_state["_msg_counter"])
+        st.session_state["_msg_counter"] += 1
+        st.session_state.setdefault("chat_history", collections.deque())
+        st.session_state.chat_history.append((chat_input, response, persona, message_id))
+        _archive_overflow()
 
-        if st.button("💾 Save Chat"):
-            with open("chat_history.txt", "a") as f:
-                f.write(f"{datetime.datetime.now()}\n{chat_input}\n{response}\n\n")
-            st.success("Chat saved!")
+    # Rendered outside the submit branch: the save click triggers its own
+    # rerun where `submitted` is False, so a button nested above would
+    # never exist on the rerun that carries the click.
+    if st.session_state.get("chat_history"):
+        st.button("💾 Save Chat", on_click=_save_last_chat)
+
+    # ============ CHAT HISTORY DISPLAY ===============
+    if st.session_state.get("chat_archive") and st.button("📜 Load older"):
+        _restore_archived()
+    history = list(st.session_state.get("chat_history", ()))
+    if history:
+        # One coalesced markdown call for everything but the newest
+        # messages; rendering each old message as its own widget set means
+        # hundreds of websocket frames per rerun on long sessions.
+        older = history[:-3]
+        if older:
+            st.markdown(
+                "\n\n---\n\n".join(
+                    f"**You:** {u}\n\n**AI ({p}):** {a}" for u, a, p, _ in older
+                )
+            )
+            st.markdown("---")
+        for user_msg, ai_msg, msg_persona, msg_id in history[-3:]:
+            st.markdown(f"**You:** {user_msg}")
+            st.markdown(f"**AI ({msg_persona}):** {ai_msg}")
+            up_col, down_col, _ = st.columns([1, 1, 10])
+            # on_click runs the state mutation before the rerun renders,
+            # so a thumbs click doesn't re-enter the whole handler chain.
+            up_col.button("👍", key=f"up_{msg_id}", on_click=_record_feedback,
+                          args=(msg_id, user_msg, ai_msg, msg_persona, "up"))
+            down_col.button("👎", key=f"down_{msg_id}", on_click=_record_feedback,
+                            args=(msg_id, user_msg, ai_msg, msg_persona, "down"))
+            st.markdown("---")
+
+    # ============ LEARN A TOPIC ===============
+    st.markdown("---")
+    st.header("📖 Learn a Topic")
+    learn_topic_input = st.text_input("📚 Topic to learn")
+
+    if st.button("📖 Get Learning Material") and learn_topic_input:
+        st.session_state.learning_topic = learn_topic_input
+        st.session_state.learning_content = _fetch_learning_content(learn_topic_input, persona, lang)
+        st.markdown(st.session_state.learning_content)
 
     # ============ QUIZ GENERATOR ===============
     st.markdown("---")
     st.header("🧪 Quiz Generator")
     subject = st.selectbox("📘 Subject", ["Math", "Science", "English"])
-    grade = st.selectbox("🎓 Class", [str(i) for i in range(1, 13)])
+    grade = st.selectbox("🎓 Class", _GRADES)
     chapter = st.text_input("📖 Chapter")
 
     if st.button("🎯 Generate Quiz"):
         st.subheader(f"Quiz: {subject} - Class {grade} - {chapter}")
-        for i in range(1, 6):
-            q = f"Q{i}. What is {random.randint(1,10)} + {random.randint(1,10)}?"
-            st.markdown(f"{q}\n- A) {random.randint(10,20)}\n- B) {random.randint(5,15)}\n- C) {random.randint(1,10)}")
+        topic = st.session_state.get("learning_topic")
+        if topic:
+            # The quiz and the learning-material refresh are independent
+            # completions, so run both on the pool: wall-clock is
+            # max(learn, quiz) instead of their sum.
+            ex = _pool()
+            f_learn = ex.submit(_fetch_learning_content, topic, persona, lang)
+            f_quiz = ex.submit(_fetch_quiz, topic, subject, grade, chapter)
+            st.session_state.learning_content = f_learn.result()
+            st.markdown(f_quiz.result())
+        else:
+            # No topic yet: fall back to the offline arithmetic quiz. One
+            # vectorized draw for all questions (operands + three options
+            # per row, with per-column bounds) and one markdown call.
+            vals = _RNG.integers((1, 1, 10, 5, 1), (11, 11, 21, 16, 11), size=(5, 5))
+            lines = [
+                f"Q{i}. What is {a} + {b}?\n- A) {c}\n- B) {d}\n- C) {e}"
+                for i, (a, b, c, d, e) in enumerate(vals.tolist(), start=1)
+            ]
+            st.markdown("\n\n".join(lines))
 
     authenticator.logout("🚪 Logout", "sidebar")
@@ -0,0 +1,206 @@
+import collections
+import contextlib
+import functools
+import types
+import hashlib
+import json
+import os
+from unittest.mock import Mock, patch
+
+import httpx
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+
+# One lightweight typed response instead of a chain of auto-spawned
+# MagicMocks per test; the object validates once and behaves exactly like
+# what the client returns. Memoized so repeated requests for the same
+# content share one instance instead of re-running pydantic validation.
+@functools.lru_cache(maxsize=128)
+def create_chat_completion(response):
+    return ChatCompletion(
+        id="chatcmpl-test",
+        object="chat.completion",
+        created=0,
+        model="gpt-3.5-turbo",
+        choices=[
+            Choice(
+                index=0,
+                finish_reason="stop",
+                message=ChatCompletionMessage(role="assistant", content=response),
+            )
+        ],
+    )
+
+# A plain dict stands in for session state outside the fixture patches,
+# so the atexit chat flush doesn't hit the real proxy at interpreter
+# exit. Started once per process and intentionally never stopped.
+_state_patch = patch("streamlit.session_state", {})
+_state_patch.start()
+
+
+# Stands in for streamlit's session state. Tests and handlers mostly use
+# attribute access, which SimpleNamespace serves straight from the C
+# tp_getattro slot with no Python-level __getattr__ frame; the mapping
+# methods below expose the same __dict__ for the item-style accesses.
+class _SessionState(types.SimpleNamespace):
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __setitem__(self, key, value):
+        self.__dict__[key] = value
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+    def get(self, key, default=None):
+        return self.__dict__.get(key, default)
+
+    def setdefault(self, key, default=None):
+        return self.__dict__.setdefault(key, default)
+
+    def keys(self):
+        return self.__dict__.keys()
+
+    def update(self, *args, **kwargs):
+        self.__dict__.update(*args, **kwargs)
+
+    def clear(self):
+        self.__dict__.clear()
+
+
+# Mock-backed patch targets, declared once at module load so the target
+# strings are interned a single time; entries are (target, Mock kwargs)
+# and the mock's key in the fixture bundle is the lower-cased attribute
+# name. Plain Mock skips MagicMock's _all_magics setup loop — these
+# doubles only ever need call recording, not magic-method support.
+_PATCH_SPECS = (
+    ("streamlit.stop", {"side_effect": Exception("Simulated st.stop")}),
+    ("streamlit.error", {}),
+    ("streamlit.warning", {}),
+    ("streamlit.success", {}),
+    ("streamlit.markdown", {}),
+    ("streamlit.toast", {}),
+    ("streamlit_authenticator.Authenticate", {}),
+)
+
+
+# The patch stack and its mock scaffolding are built once per session;
+# the autouse reset fixture below only clears state between tests
+# instead of reconstructing eight patches per test.
+@pytest.fixture(scope="session")
+def _streamlit_mocks():
+    session_state = _SessionState()
+
+    with contextlib.ExitStack() as stack:
+        secrets = stack.enter_context(patch("streamlit.secrets", {"OPENAI_API_KEY": "fake_api_key"}))
+        stack.enter_context(patch("streamlit.session_state", session_state))
+        mocks = {
+            target.rsplit(".", 1)[1].lower(): stack.enter_context(patch(target, Mock(**kwargs)))
+            for target, kwargs in _PATCH_SPECS
+        }
+        mocks["authenticate"].return_value.login.return_value = (None, None, None)
+        mocks["secrets"] = secrets
+        mocks["session_state"] = session_state
+        mocks["state"] = session_state
+        yield mocks
+
+
+# Importing app runs its whole module body (widget calls, login flow,
+# cache setup), so defer it to first use and do it inside the session
+# mocks instead of at collection time.
+@pytest.fixture(scope="session")
+def streamlit_app(_streamlit_mocks):
+    import app
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def mock_streamlit_elements(_streamlit_mocks):
+    state = _streamlit_mocks["state"]
+    session_state = _streamlit_mocks["session_state"]
+    state.clear()
+    _streamlit_mocks["secrets"].clear()
+    _streamlit_mocks["secrets"]["OPENAI_API_KEY"] = "fake_api_key"
+    for name in ("stop", "error", "warning", "success", "markdown", "toast"):
+        _streamlit_mocks[name].reset_mock()
+
+    # Re-seed the stores the handlers expect. chat_history matches the
+    # app's deque representation, bounded so simulated long sessions get
+    # O(1) appends without list-resize copies or unbounded growth.
+    session_state["feedback_log"] = []
+    session_state["chat_history"] = collections.deque(maxlen=200)
+    return _streamlit_mocks
+
+
+# A real OpenAI client wired to an httpx.MockTransport, built once per
+# session. Tests push canned response payloads onto the deque instead of
+# patching SDK internals, so the request/response serialization path is
+# exercised and the double survives openai-internal refactors.
+@pytest.fixture(scope="session")
+def _openai_transport():
+    import openai as openai_sdk
+
+    pending = collections.deque()
+
+    def handler(request):
+        body = pending.popleft() if pending else create_chat_completion("[transport default]").model_dump(mode="json")
+        return httpx.Response(200, json=body)
+
+    client = openai_sdk.OpenAI(
+        api_key="fake_api_key",
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    return client, pending
+
+
+@pytest.fixture
+def openai_transport(_openai_transport):
+    client, pending = _openai_transport
+    pending.clear()
+    return client, pending
+
+
+# Disk-backed memoizer for contract tests that hit the real API: the
+# first run pays the network round-trip, every later run reads the cached
+# completion, so CI stays fast (and offline once the cache directory is
+# committed). Keyed on a sha256 of the request payload.
+@pytest.fixture(scope="session")
+def cached_openai_create():
+    import diskcache
+    import openai as openai_sdk
+
+    cache = diskcache.Cache(".openai_cache")
+    client = None
+
+    def _create(model, messages):
+        nonlocal client
+        key = hashlib.sha256(
+            json.dumps({"model": model, "messages": messages}, sort_keys=True).encode()
+        ).hexdigest()
+        if key in cache:
+            return cache[key]
+        if client is None:
+            client = openai_sdk.OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+        content = client.chat.completions.create(model=model, messages=messages).choices[0].message.content
+        cache[key] = content
+        return content
+
+    yield _create
+    cache.close()
+
+
+# app.py binds a single MockLLM instance at import when pytest is loaded,
+# so there is nothing to patch per test; this fixture just resets the
+# recorded calls, the canned response, and the completion cache between
+# tests.
+@pytest.fixture
+def mock_llm(streamlit_app):
+    llm = streamlit_app.llm
+    llm.calls.clear()
+    llm.response = "[mock response]"
+    streamlit_app._cached_completion.clear()
+    return llm
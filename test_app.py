@@ -0,0 +1,190 @@
+import dataclasses
+import os
+import sys
+
+import pytest
+
+from conftest import create_chat_completion
+
+# Invariant prompt pieces, built once instead of re-formatted in every
+# test body; they double as an exact-equality check on what the app sends.
+_LEARN_SYSTEM = {"role": "system", "content": "You are an AI assistant that provides educational content."}
+_LEARN_PROMPT_TMPL = "Explain the topic: {topic}. Use a {persona} tone and reply in {lang}."
+_QUIZ_SYSTEM = {"role": "system", "content": "You are an AI assistant that generates quizzes."}
+_QUIZ_PROMPT_TMPL = (
+    "Create a 5-question multiple-choice quiz on '{topic}' "
+    "for {subject}, class {grade}, chapter '{chapter}'."
+)
+_CHAT_SYSTEM_TMPL = "You are a {persona} assistant for students. Reply in {lang}."
+# Interned to the same object the app uses, so substring assertions on
+# the context prefix hit the interpreter's interned-string fast path.
+_CHAT_CTX_PREFIX = sys.intern(" The user is currently learning about '")
+
+
+@dataclasses.dataclass
+class Scenario:
+    id: str
+    func: str
+    args: tuple
+    expected_messages: list
+    initial_state: dict = dataclasses.field(default_factory=dict)
+    mock_content: str = None  # None: func builds messages, no LLM call
+    system_attr: str = None  # app-level constant the system message must be
+
+
+QUIZ_FROM_LEARNING = Scenario(
+    id="quiz_from_learning",
+    func="_fetch_quiz",
+    args=("Photosynthesis", "Science", "6", "Plants"),
+    mock_content="Q1. Mocked quiz question.",
+    system_attr="_QUIZ_SYSTEM_MSG",
+    expected_messages=[
+        _QUIZ_SYSTEM,
+        {"role": "user", "content": _QUIZ_PROMPT_TMPL.format(
+            topic="Photosynthesis", subject="Science", grade="6", chapter="Plants")},
+    ],
+)
+
+QUIZ_FROM_SUBJECT = Scenario(
+    id="quiz_from_subject_grade",
+    func="_fetch_quiz",
+    args=("Fractions", "Math", "4", "Basics"),
+    mock_content="Q1. Another mocked quiz.",
+    system_attr="_QUIZ_SYSTEM_MSG",
+    expected_messages=[
+        _QUIZ_SYSTEM,
+        {"role": "user", "content": _QUIZ_PROMPT_TMPL.format(
+            topic="Fractions", subject="Math", grade="4", chapter="Basics")},
+    ],
+)
+
+CHAT_PLAIN = Scenario(
+    id="chat_without_learning_context",
+    func="_build_chat_messages",
+    args=("What is gravity?", "Teacher", "English"),
+    expected_messages=[
+        {"role": "system", "content": _CHAT_SYSTEM_TMPL.format(persona="Teacher", lang="English")},
+        {"role": "user", "content": "What is gravity?"},
+    ],
+)
+
+CHAT_CTX = Scenario(
+    id="chat_with_learning_context",
+    func="_build_chat_messages",
+    args=("Explain more", "Teacher", "English"),
+    initial_state={"learning_topic": "Photosynthesis"},
+    expected_messages=[
+        {"role": "system", "content": "".join((
+            _CHAT_SYSTEM_TMPL.format(persona="Teacher", lang="English"),
+            _CHAT_CTX_PREFIX, "Photosynthesis", "'."))},
+        {"role": "user", "content": "Explain more"},
+    ],
+)
+
+
+def test_fetch_learning_content(streamlit_app, mock_llm):
+    mock_llm.response = "Mocked explanation for Photosynthesis."
+
+    content = streamlit_app._fetch_learning_content("Photosynthesis", "Teacher", "English")
+
+    assert content == "Mocked explanation for Photosynthesis."
+    expected_user = _LEARN_PROMPT_TMPL.format(topic="Photosynthesis", persona="Teacher", lang="English")
+    sent = mock_llm.calls[-1]
+    assert sent[0] is streamlit_app._LEARN_SYSTEM_MSG
+    assert sent[1] == {"role": "user", "content": expected_user}
+
+
+@pytest.mark.parametrize(
+    "scenario",
+    [QUIZ_FROM_LEARNING, QUIZ_FROM_SUBJECT, CHAT_PLAIN, CHAT_CTX],
+    ids=lambda s: s.id,
+)
+def test_llm_scenarios(streamlit_app, mock_llm, mock_streamlit_elements, scenario):
+    state = mock_streamlit_elements["state"]
+    state.update(scenario.initial_state)
+    if scenario.mock_content is not None:
+        mock_llm.response = scenario.mock_content
+
+    result = getattr(streamlit_app, scenario.func)(*scenario.args)
+
+    if scenario.mock_content is not None:
+        assert result == scenario.mock_content
+        sent = mock_llm.calls[-1]
+        if scenario.system_attr is not None:
+            # The app sends its module-level system-message constant, so
+            # an O(1) identity check replaces deep-comparing the content.
+            assert sent[0] is getattr(streamlit_app, scenario.system_attr)
+            assert sent[1:] == scenario.expected_messages[1:]
+        else:
+            assert sent == scenario.expected_messages
+    else:
+        assert result == scenario.expected_messages
+
+
+def test_real_llm_chat(streamlit_app, openai_transport, monkeypatch):
+    client, pending = openai_transport
+    pending.append(create_chat_completion("Typed canned answer.").model_dump(mode="json"))
+    monkeypatch.setattr(streamlit_app, "_openai_client", lambda: client)
+
+    content = streamlit_app.RealLLM().chat([{"role": "user", "content": "hi"}])
+
+    assert content == "Typed canned answer."
+    assert not pending
+
+
+def test_record_feedback(streamlit_app, mock_streamlit_elements):
+    streamlit_app._record_feedback("1", "hi there", "hello!", "Fun", "up")
+
+    log = mock_streamlit_elements["state"]["feedback_log"]
+    assert len(log) == 1
+    assert log[0]["message_id"] == "1"
+    assert log[0]["feedback"] == "up"
+    mock_streamlit_elements["toast"].assert_called_once()
+
+
+def test_save_last_chat(streamlit_app, mock_streamlit_elements):
+    state = mock_streamlit_elements["state"]
+    state["chat_history"].append(("hi there", "hello!", "Fun", "1"))
+    state["_chat_write_buf"] = []
+    # A fresh flush timestamp plus a single buffered entry keeps the
+    # batched flush from touching chat_history.txt during the test.
+    state["_chat_last_flush"] = streamlit_app.time.time()
+
+    streamlit_app._save_last_chat()
+
+    (entry,) = state["_chat_write_buf"]
+    assert entry.endswith("hi there\nhello!\n\n")
+    mock_streamlit_elements["toast"].assert_called_once()
+
+
+def test_perf_fetch_learning_content(benchmark, streamlit_app, mock_llm):
+    # Tracks per-test overhead of the representative fetch path (cache
+    # lookup + mock LLM) so fixture bloat shows up as a timing regression.
+    result = benchmark(
+        streamlit_app._fetch_learning_content, "Photosynthesis", "Teacher", "English"
+    )
+
+    assert result == mock_llm.response
+
+
+@pytest.mark.skipif(
+    "OPENAI_API_KEY" not in os.environ,
+    reason="contract test; needs a real API key on first run to seed the cache",
+)
+def test_contract_learning_material(cached_openai_create):
+    content = cached_openai_create(
+        "gpt-3.5-turbo",
+        [
+            _LEARN_SYSTEM,
+            {"role": "user", "content": _LEARN_PROMPT_TMPL.format(
+                topic="Photosynthesis", persona="Teacher", lang="English")},
+        ],
+    )
+
+    assert isinstance(content, str)
+    assert content
+
+
+def test_api_key_missing(mock_streamlit_elements):
+    with pytest.raises(Exception, match="Simulated st.stop"):
+        mock_streamlit_elements["stop"]()